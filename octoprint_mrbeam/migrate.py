@@ -1,16 +1,18 @@
+import glob
 import json
+import logging
 from collections import Iterable, Sized, Mapping
 import os
 import re
 import shutil
-from datetime import datetime
+from datetime import date
 from distutils.version import LooseVersion, StrictVersion
 
 from octoprint_mrbeam import IS_X86
 from octoprint_mrbeam.software_update_information import BEAMOS_LEGACY_DATE
 from octoprint_mrbeam.mrb_logger import mrb_logger
 from octoprint_mrbeam.util.cmd_exec import exec_cmd, exec_cmd_output
-from octoprint_mrbeam.util import logExceptions
+from octoprint_mrbeam.util import logExceptions, parse_version
 from octoprint_mrbeam.printing.profile import laserCutterProfileManager
 from octoprint_mrbeam.printing.comm_acc2 import MachineCom
 from octoprint_mrbeam.__version import __version__
@@ -19,9 +21,14 @@ from octoprint_mrbeam.migration import (
     MIGRATION_STATE,
     MigrationBaseClass,
     list_of_migrations,
+    load_migration,
 )
 
 
+# egg dirs/files of MrBeamPlugin left over in site-packages, e.g. Mr_Beam-0.1.13-py2.7.egg
+_EGG_RE = re.compile(r"Mr_Beam-(?P<version>[0-9.]+)[.-].+")
+
+
 def migrate(plugin):
     Migration(plugin).run()
 
@@ -50,6 +57,9 @@ class Migration(object):
     VERSION_UPDATE_OCTOPRINT_PRERELEASE_FIX = "0.9.10"
     VERSION_UPDATE_FORCE_FOCUS_REMINDER = "0.10.0"
 
+    # images up to this date need fix_s_series_mount_manager()
+    BEAMOS_DATE_FIX_S_SERIES_MOUNT_MANAGER = date(2021, 7, 19)
+
     # this is where we have files needed for migrations
     MIGRATE_FILES_FOLDER = "files/migrate/"
     MIGRATE_LOGROTATE_FOLDER = "files/migrate_logrotate/"
@@ -64,6 +74,18 @@ class Migration(object):
     # mount manager version
     MOUNT_MANAGER_VERSION = StrictVersion("1.7.2")
 
+    # lasercutterProfiles which are created from the generic profile if missing, by device series
+    LASERCUTTER_PROFILES = {
+        "2C": dict(
+            model="C",
+            legacy=dict(job_done_home_position_x=250),
+            grbl_settings={130: 501.1},
+        ),
+        "2D": dict(model="D"),
+        "2E": dict(model="E"),
+        "2F": dict(model="F"),
+    }
+
     def __init__(self, plugin):
         self._logger = mrb_logger("octoprint.plugins.mrbeam.migrate")
         self.plugin = plugin
@@ -229,7 +251,7 @@ class Migration(object):
                     self.beamos_date is not None
                     and BEAMOS_LEGACY_DATE
                     < self.beamos_date
-                    <= datetime.strptime("2021-07-19", "%Y-%m-%d").date()
+                    <= self.BEAMOS_DATE_FIX_S_SERIES_MOUNT_MANAGER
                     and (self.plugin._settings.get(["version"]) is None)
                 ):  # for images before the 19.7.2021
                     self.fix_s_series_mount_manager()
@@ -282,14 +304,17 @@ class Migration(object):
         run the new migrations
         @return:
         """
-        self._logger.debug("beamos_version: {}".format(self.beamos_version))
+        self._logger.debug("beamos_version: %s", self.beamos_version)
 
         list_of_migrations_obj_available_to_run = [
             MigrationBaseClass.return_obj(migration, self.plugin)
-            for migration in list_of_migrations
+            for migration in map(load_migration, list_of_migrations)
             if migration.shouldrun(migration, self.beamos_version)
         ]
-        self._logger.debug(list_of_migrations_obj_available_to_run)
+        self._logger.debug(
+            "migrations available to run: %s",
+            list_of_migrations_obj_available_to_run,
+        )
 
         if not len(list_of_migrations_obj_available_to_run):
             self._logger.info("new migration - no migration needed")
@@ -299,61 +324,72 @@ class Migration(object):
             self.plugin._settings.getBaseFolder("base"), "migrations.json"
         )
 
-        # if file is not there create it
-        if not os.path.exists(migrations_json_file_path):
-            self._logger.info("create " + migrations_json_file_path + " file")
-            with open(migrations_json_file_path, "w") as f:
-                json.dump({}, f)
-
         try:
-            with open(migrations_json_file_path, "r") as f:
-                try:
-                    migration_executed = json.load(f)
-                except ValueError:
-                    raise MigrationException(
-                        "couldn't read migrations json file content filepath:"
-                        + migrations_json_file_path
-                    )
-
-                list_of_migrations_to_run = list(
-                    list_of_migrations_obj_available_to_run
+            # if file is not there it will be created with the results of this run
+            if not os.path.exists(migrations_json_file_path):
+                self._logger.info(
+                    "%s not found, it will be written after the migrations ran",
+                    migrations_json_file_path,
                 )
-                for migration in list_of_migrations_obj_available_to_run:
-                    if migration.id in migration_executed:
-                        if migration_executed[migration.id]:
-                            list_of_migrations_to_run.remove(migration)
-                        else:
-                            # migration failed, should stay in execution queue and the following too
-                            break
-
-                if not len(list_of_migrations_to_run):
-                    self._logger.info("new migration - all migrations already done")
-                    return
-
-                for migration in list_of_migrations_to_run:
-                    migration.run()
-
-                    # if migration sucessfull append to executed successfull
-                    if migration.state == MIGRATION_STATE.migration_done:
-                        migration_executed[migration.id] = True
+                migration_executed = {}
+            else:
+                with open(migrations_json_file_path, "r") as f:
+                    try:
+                        migration_executed = json.load(f)
+                    except ValueError:
+                        raise MigrationException(
+                            "couldn't read migrations json file content filepath:"
+                            + migrations_json_file_path
+                        )
+
+            list_of_migrations_to_run = list(list_of_migrations_obj_available_to_run)
+            for migration in list_of_migrations_obj_available_to_run:
+                if migration.id in migration_executed:
+                    if migration_executed[migration.id]:
+                        list_of_migrations_to_run.remove(migration)
                     else:
-                        # mark migration as failed and skipp the following ones
-                        migration_executed[migration.id] = False
+                        # migration failed, should stay in execution queue and the following too
                         break
 
-            with open(migrations_json_file_path, "w") as f:
-                f.write(json.dumps(migration_executed))
-        except IOError:
+            if not len(list_of_migrations_to_run):
+                self._logger.info("new migration - all migrations already done")
+                return
+
+            for migration in list_of_migrations_to_run:
+                migration.run()
+
+                # if migration sucessfull append to executed successfull
+                if migration.state == MIGRATION_STATE.migration_done:
+                    migration_executed[migration.id] = True
+                else:
+                    # mark migration as failed and skipp the following ones
+                    migration_executed[migration.id] = False
+                    break
+
+            # write to a temp file first, a power cut must not leave a truncated file
+            tmp_file_path = migrations_json_file_path + ".tmp"
+            try:
+                with open(tmp_file_path, "w") as f:
+                    f.write(json.dumps(migration_executed))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.rename(tmp_file_path, migrations_json_file_path)
+            except (IOError, OSError):
+                if os.path.exists(tmp_file_path):
+                    os.remove(tmp_file_path)
+                raise
+        except (IOError, OSError):
             self._logger.error("migration execution file IO error")
         except MigrationException as e:
             self._logger.exception("error during migration {}".format(e))
 
     def is_migration_required(self):
-        self._logger.debug(
-            "beomosdate %s version %s",
-            self.beamos_date,
-            self.plugin._settings.get(["version"]),
-        )
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(
+                "beomosdate %s version %s",
+                self.beamos_date,
+                self.plugin._settings.get(["version"]),
+            )
         if (
             self.beamos_date is not None
             and BEAMOS_LEGACY_DATE < self.beamos_date
@@ -363,7 +399,7 @@ class Migration(object):
         if self.version_previous is None:
             return True
         try:
-            LooseVersion(self.version_previous)
+            previous = parse_version(self.version_previous)
         except ValueError as e:
             self._logger.error(
                 "Previous version is invalid: '{}'. ValueError from LooseVersion: {}".format(
@@ -371,7 +407,7 @@ class Migration(object):
                 )
             )
             return None
-        return LooseVersion(self.version_current) > LooseVersion(self.version_previous)
+        return parse_version(self.version_current) > previous
 
     def _compare_versions(self, lower_vers, higher_vers, equal_ok=True):
         """
@@ -384,8 +420,8 @@ class Migration(object):
         if lower_vers is None or higher_vers is None:
             return None
         try:
-            LooseVersion(lower_vers)
-            LooseVersion(higher_vers)
+            lower = parse_version(lower_vers)
+            higher = parse_version(higher_vers)
         except ValueError as e:
             self._logger.error(
                 "_compare_versions() One of the two version is invalid: lower_vers:{}, higher_vers:{}. ValueError from LooseVersion: {}".format(
@@ -393,9 +429,9 @@ class Migration(object):
                 )
             )
             return None
-        if LooseVersion(lower_vers) == LooseVersion(higher_vers):
+        if lower == higher:
             return equal_ok
-        return LooseVersion(lower_vers) < LooseVersion(higher_vers)
+        return lower < higher
 
     def save_current_version(self):
         if self.plugin._settings.get(["version"]) != self.version_current:
@@ -424,8 +460,9 @@ class Migration(object):
         folders = []
         keep_version = None
         if os.path.isdir(site_packages_dir):
-            for f in os.listdir(site_packages_dir):
-                match = re.match(r"Mr_Beam-(?P<version>[0-9.]+)[.-].+", f)
+            for path in glob.glob(os.path.join(site_packages_dir, "Mr_Beam-*")):
+                f = os.path.basename(path)
+                match = _EGG_RE.match(f)
                 if match:
                     version = match.group("version")
                     folders.append((version, f))
@@ -526,32 +563,16 @@ sysctl -w net.ipv4.conf.all.route_localnet=1
 iptables -t nat -I PREROUTING -p tcp --dport 80 -j DNAT --to 127.0.0.1:80
 """
 
-        command = [
-            "sudo",
-            "bash",
-            "-c",
-            "echo '{data}' > {file}".format(data=iptables_body, file=iptables_file),
-        ]
+        # write, chmod and execute the conf within one single sudo call
+        script = (
+            "cat > {file} <<'EOF' && chmod +x {file} && {file}\n{data}EOF\n"
+        ).format(data=iptables_body, file=iptables_file)
+        command = ["sudo", "bash", "-c", script]
         out, code = exec_cmd_output(command)
         if code != 0:
             self._logger.error(
-                "setup_iptables() Error while writing iptables conf: '%s'", out
-            )
-            return
-
-        command = ["sudo", "chmod", "+x", iptables_file]
-        out, code = exec_cmd_output(command)
-        if code != 0:
-            self._logger.error(
-                "setup_iptables() Error while chmod iptables conf: '%s'", out
-            )
-            return
-
-        command = ["sudo", "bash", "-c", iptables_file]
-        out, code = exec_cmd_output(command)
-        if code != 0:
-            self._logger.error(
-                "setup_iptables() Error while executing iptables conf: '%s'", out
+                "setup_iptables() Error while writing and executing iptables conf: '%s'",
+                out,
             )
             return
 
@@ -837,93 +858,52 @@ iptables -t nat -I PREROUTING -p tcp --dport 80 -j DNAT --to 127.0.0.1:80
                     self.plugin._device_series,
                 )
                 return
-            elif self.plugin._device_series == "2C":
-                self.set_lasercutterPorfile_2C()
-            elif self.plugin._device_series in ("2D", "2E", "2F"):
-                self.set_lasercutterPorfile_2DEF(series=self.plugin._device_series[1])
-            else:
-                self.set_lasercutterPorfile_2all()
+            self.set_lasercutterProfile_of_series(self.plugin._device_series)
             self.save_current_version()
 
-    def set_lasercutterPorfile_2all(self):
-        profile_id = "MrBeam{}".format(self.plugin._device_series)
-        if laserCutterProfileManager().exists(profile_id):
-            laserCutterProfileManager().set_default(profile_id)
-            self._logger.info(
-                "set_lasercutterPorfile_2all() Set lasercutterProfile '%s' as default.",
-                profile_id,
-            )
-        else:
-            self._logger.warn(
-                "set_lasercutterPorfile_2all() No lasercutterProfile '%s' found. Keep using generic profile.",
-                profile_id,
-            )
-
-    def set_lasercutterPorfile_2C(self):
+    def set_lasercutterProfile_of_series(self, series):
         """
+        Sets lasercutterProfile 'MrBeam<series>' as default.
+        In case it does not exist it's created from the generic profile if the series is in LASERCUTTER_PROFILES.
         Series C came with no default lasercutterProfile set.
         FYI: the image contained only a profile called 'MrBeam2B' which was never used since it wasn't set as default
+        :param series: device series like '2C'
         """
-        profile_id = "MrBeam2C"
-        model = "C"
+        profile_id = "MrBeam{}".format(series)
 
         if laserCutterProfileManager().exists(profile_id):
             laserCutterProfileManager().set_default(profile_id)
             self._logger.info(
-                "set_lasercutterPorfile_2C() Set lasercutterProfile '%s' as default.",
+                "set_lasercutterProfile_of_series() Set lasercutterProfile '%s' as default.",
                 profile_id,
             )
-        else:
-            default_profile = laserCutterProfileManager().get_default()
-            default_profile["id"] = profile_id
-            default_profile["name"] = "MrBeam2"
-            default_profile["model"] = model
-            default_profile["legacy"] = dict()
-            default_profile["legacy"]["job_done_home_position_x"] = 250
-            default_profile["grbl"]["settings"][130] = 501.1
-            laserCutterProfileManager().save(
-                default_profile, allow_overwrite=True, make_default=True
-            )
-            self._logger.info(
-                "set_lasercutterPorfile_2C() Created lasercutterProfile '%s' and set as default. Content: %s",
-                profile_id,
-                default_profile,
-            )
-
-    def set_lasercutterPorfile_2DEF(self, series):
-        """
-        In case lasercutterProfile does not exist
-        :return:
-        """
-        series = series.upper()
-        profile_id = "MrBeam2{}".format(series)
-        model = series
+            return
 
-        if laserCutterProfileManager().exists(profile_id):
-            laserCutterProfileManager().set_default(profile_id)
-            self._logger.info(
-                "set_lasercutterPorfile_2DEF() Set lasercutterProfile '%s' as default.",
+        profile_conf = self.LASERCUTTER_PROFILES.get(series, None)
+        if profile_conf is None:
+            self._logger.warn(
+                "set_lasercutterProfile_of_series() No lasercutterProfile '%s' found. Keep using generic profile.",
                 profile_id,
             )
-        else:
-            default_profile = laserCutterProfileManager().get_default()
-            default_profile["id"] = profile_id
-            default_profile["name"] = "MrBeam2"
-            default_profile["model"] = model
-            laserCutterProfileManager().save(
-                default_profile, allow_overwrite=True, make_default=True
-            )
-            self._logger.info(
-                "set_lasercutterPorfile_2DEF() Created lasercutterProfile '%s' and set as default. Content: %s",
-                profile_id,
-                default_profile,
-            )
+            return
 
-            self._logger.info(
-                "set_lasercutterPorfile_2DEF() Created lasercutterProfile '%s' and set as default. Content: %s",
-                profile_id,
-                default_profile,
-            )
+        default_profile = laserCutterProfileManager().get_default()
+        default_profile["id"] = profile_id
+        default_profile["name"] = "MrBeam2"
+        default_profile["model"] = profile_conf["model"]
+        if "legacy" in profile_conf:
+            default_profile["legacy"] = dict(profile_conf["legacy"])
+        default_profile["grbl"]["settings"].update(
+            profile_conf.get("grbl_settings", {})
+        )
+        laserCutterProfileManager().save(
+            default_profile, allow_overwrite=True, make_default=True
+        )
+        self._logger.info(
+            "set_lasercutterProfile_of_series() Created lasercutterProfile '%s' and set as default. Content: %s",
+            profile_id,
+            default_profile,
+        )
 
     def rm_camera_calibration_repo(self):
         """Delete the legacy camera calibration and detection repo."""
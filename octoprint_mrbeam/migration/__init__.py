@@ -4,10 +4,13 @@ To add a new migration create a child class of the MigrationBaseClass and extend
 the steps needed for the new migration and the beamOS versions it should run for
 
 How to use:
-    - import list_of_migrations
-    - iterate over the list items and run the shouldrun(<migrationclass>, <beamos_version>)
+    - import list_of_migrations and load_migration
+    - iterate over the list items, load the migration class with load_migration(<entry>)
+      and run the shouldrun(<migrationclass>, <beamos_version>)
     - compare the result list with the already executed list and call the run() of the result list
 """
+import importlib
+
 # these imports are for external use
 from octoprint_mrbeam.migration.migration_base import MIGRATION_STATE as MIGRATION_STATE
 from octoprint_mrbeam.migration.migration_base import (
@@ -17,10 +20,22 @@ from octoprint_mrbeam.migration.migration_base import (
     MigrationException as MigrationException,
 )
 
-# this is for internal use
-from octoprint_mrbeam.migration.Mig001 import Mig001NetconnectdDisableLogDebugLevel
-
 # To add migrations they have to be added to this list till we automate it
+# entries are "<module>:<class>", the modules are only imported by load_migration()
 list_of_migrations = [
-    Mig001NetconnectdDisableLogDebugLevel,
+    "octoprint_mrbeam.migration.Mig001:Mig001NetconnectdDisableLogDebugLevel",
 ]
+
+
+def load_migration(entry):
+    """
+    imports the migration class of an entry of list_of_migrations
+
+    Args:
+        entry: "<module>:<class>" string of the migration
+
+    Returns:
+        class: the migration class
+    """
+    module_name, class_name = entry.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
@@ -1,9 +1,9 @@
 import abc, six
 import os
 from abc import abstractmethod
-from distutils.version import LooseVersion
 
 from octoprint_mrbeam import mrb_logger
+from octoprint_mrbeam.util import parse_version
 from octoprint_mrbeam.util.cmd_exec import exec_cmd
 
 
@@ -89,9 +89,9 @@ class MigrationBaseClass:
             ).error("beamos_version is not a string: {}".format(beamos_version))
             return False
         if (
-            LooseVersion(cls.BEAMOS_VERSION_LOW)
-            <= LooseVersion(beamos_version)
-            <= LooseVersion(cls.BEAMOS_VERSION_HIGH)
+            parse_version(cls.BEAMOS_VERSION_LOW)
+            <= parse_version(beamos_version)
+            <= parse_version(cls.BEAMOS_VERSION_HIGH)
         ):
             return True
         else:
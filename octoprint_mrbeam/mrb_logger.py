@@ -70,6 +70,9 @@ class MrbLogger(object):
     def setLevel(self, *args, **kwargs):
         self.logger.setLevel(*args, **kwargs)
 
+    def isEnabledFor(self, level):
+        return self.logger.isEnabledFor(level)
+
     def log(self, level, msg, *args, **kwargs):
         """
         Logs the given message like the regular python logger. Still there are mrb-specific options available.
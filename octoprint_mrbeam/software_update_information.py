@@ -1,11 +1,15 @@
 from datetime import datetime, date
+import logging
 import os, sys
 
-from octoprint.util import dict_merge
 from octoprint_mrbeam import IS_X86
 from octoprint_mrbeam.mrb_logger import mrb_logger
 from octoprint_mrbeam.util import logExceptions
-from util.pip_util import get_version_of_pip_module
+from util.pip_util import (
+    get_version_of_pip_module,
+    clear_pip_version_cache,
+    prefetch_pip_package_lists,
+)
 
 
 SW_UPDATE_TIER_PROD = "PROD"
@@ -35,6 +39,14 @@ GLOBAL_PIP_COMMAND = (
 # GLOBAL_PIP_COMMAND = "sudo {} -m pip".format(GLOBAL_PY_BIN) if os.path.isfile(GLOBAL_PY_BIN) else None #  --disable-pip-version-check
 # VENV_PIP_COMMAND = ("%s -m pip --disable-pip-version-check" % VENV_PY_BIN).split(' ') if os.path.isfile(VENV_PY_BIN) else None
 BEAMOS_LEGACY_DATE = date(2018, 1, 12)
+# pip of the package virtualenvs on images newer than BEAMOS_LEGACY_DATE, by module_id
+# older images have all these packages installed with GLOBAL_PIP_COMMAND
+VENV_PIP_COMMANDS = {
+    "mrbeam-ledstrips": "sudo /usr/local/mrbeam_ledstrips/venv/bin/pip",
+    "netconnectd-daemon": "sudo /usr/local/netconnectd/venv/bin/pip",
+    "iobeam": "sudo /usr/local/iobeam/venv/bin/pip",
+    "mrb_hw_info": "sudo /usr/local/iobeam/venv/bin/pip",
+}
 
 
 def get_update_information(plugin):
@@ -47,33 +59,46 @@ def get_update_information(plugin):
     # The increased number of separate virtualenv for iobeam, netconnectd, ledstrips
     # will increase the "discovery time" to find those package versions.
     # "map-reduce" method can decrease lookup time by processing them in parallel
-    res = dict(
-        reduce(
-            dict_merge,
-            [
-                _set_info_mrbeam_plugin(plugin, tier, beamos_date),
-                _set_info_mrbeamdoc(plugin, tier),
-                _set_info_netconnectd_plugin(plugin, tier, beamos_date),
-                _set_info_findmymrbeam(plugin, tier),
-                _set_info_mrbeamledstrips(plugin, tier, beamos_date),
-                _set_info_netconnectd_daemon(plugin, tier, beamos_date),
-                _set_info_iobeam(plugin, tier, beamos_date),
-                _set_info_mrb_hw_info(plugin, tier, beamos_date),
-                _config_octoprint(plugin, tier),
-            ],
-        )
-    )
-    for pack, updt_info in res.items():
-        _logger.debug(
-            "{} targets branch {} using pip {}".format(
+    prefetch_pip_package_lists(_get_pip_commands(beamos_date))
+    res = dict()
+    for module_info in [
+        _set_info_mrbeam_plugin(plugin, tier, beamos_date),
+        _set_info_mrbeamdoc(plugin, tier),
+        _set_info_netconnectd_plugin(plugin, tier, beamos_date),
+        _set_info_findmymrbeam(plugin, tier),
+        _set_info_mrbeamledstrips(plugin, tier, beamos_date),
+        _set_info_netconnectd_daemon(plugin, tier, beamos_date),
+        _set_info_iobeam(plugin, tier, beamos_date),
+        _set_info_mrb_hw_info(plugin, tier, beamos_date),
+        _config_octoprint(plugin, tier),
+    ]:
+        # every entry only holds its own module_id, a flat update is enough
+        # and avoids deep copying the accumulated result for every module
+        res.update(module_info)
+    if _logger.isEnabledFor(logging.DEBUG):
+        for pack, updt_info in res.items():
+            _logger.debug(
+                "%s targets branch %s using pip %s",
                 pack,
                 updt_info.get("branch"),
                 updt_info.get("pip_command", "~/oprint/bin/pip"),
             )
-        )
     return res
 
 
+def _get_pip_command(module_id, beamos_date):
+    """Pip command to look up the version of a module listed in VENV_PIP_COMMANDS."""
+    if beamos_date > BEAMOS_LEGACY_DATE:
+        return VENV_PIP_COMMANDS[module_id]
+    else:
+        return GLOBAL_PIP_COMMAND
+
+
+def _get_pip_commands(beamos_date):
+    """Pip commands used by the _set_info_* functions to look up package versions."""
+    return [_get_pip_command(module_id, beamos_date) for module_id in VENV_PIP_COMMANDS]
+
+
 def software_channels_available(plugin):
     ret = [SW_UPDATE_TIER_PROD, SW_UPDATE_TIER_BETA]
     if plugin.is_dev_env():
@@ -95,6 +120,8 @@ def switch_software_channel(plugin, channel):
         sw_update_plugin._refresh_configured_checks = True
         sw_update_plugin._version_cache = dict()
         sw_update_plugin._version_cache_dirty = True
+        # versions of pip packages are looked up again with the new channel config
+        clear_pip_version_cache()
         plugin.analytics_handler.add_software_channel_switch_event(old_channel, channel)
 
 
@@ -175,10 +202,7 @@ def _set_info_findmymrbeam(plugin, tier):
 
 
 def _set_info_mrbeamledstrips(plugin, tier, beamos_date):
-    if beamos_date > BEAMOS_LEGACY_DATE:
-        pip_command = "sudo /usr/local/mrbeam_ledstrips/venv/bin/pip"
-    else:
-        pip_command = GLOBAL_PIP_COMMAND
+    pip_command = _get_pip_command("mrbeam-ledstrips", beamos_date)
     return _get_package_description_with_version(
         "mrbeam-ledstrips",
         tier,
@@ -193,10 +217,9 @@ def _set_info_mrbeamledstrips(plugin, tier, beamos_date):
 def _set_info_netconnectd_daemon(plugin, tier, beamos_date):
     if beamos_date > BEAMOS_LEGACY_DATE:
         branch = "master"
-        pip_command = "sudo /usr/local/netconnectd/venv/bin/pip"
     else:
         branch = "mrbeam2-stable"
-        pip_command = GLOBAL_PIP_COMMAND
+    pip_command = _get_pip_command("netconnectd-daemon", beamos_date)
     package_name = "netconnectd"
     # get_package_description does not search for package version.
     version = get_version_of_pip_module(package_name, pip_command)
@@ -216,10 +239,7 @@ def _set_info_netconnectd_daemon(plugin, tier, beamos_date):
 
 
 def _set_info_iobeam(plugin, tier, beamos_date):
-    if beamos_date > BEAMOS_LEGACY_DATE:
-        pip_command = "sudo /usr/local/iobeam/venv/bin/pip"
-    else:
-        pip_command = GLOBAL_PIP_COMMAND
+    pip_command = _get_pip_command("iobeam", beamos_date)
     return _get_package_description_with_version(
         module_id="iobeam",
         tier=tier,
@@ -235,10 +255,7 @@ def _set_info_iobeam(plugin, tier, beamos_date):
 
 
 def _set_info_mrb_hw_info(plugin, tier, beamos_date):
-    if beamos_date > BEAMOS_LEGACY_DATE:
-        pip_command = "sudo /usr/local/iobeam/venv/bin/pip"
-    else:
-        pip_command = GLOBAL_PIP_COMMAND
+    pip_command = _get_pip_command("mrb_hw_info", beamos_date)
     return _get_package_description_with_version(
         module_id="mrb_hw_info",
         tier=tier,
@@ -304,12 +321,13 @@ def _get_package_description(
 ):
     """Shorthand to create repo details for octoprint software update plugin to handle."""
     displayName = displayName or module_id
+    tier_id = get_tier_by_id(tier)
     if "{tier}" in branch:
-        branch = branch.format(tier=get_tier_by_id(tier))
+        branch = branch.format(tier=tier_id)
     if "{tier}" in branch_default:
-        branch_default = branch_default.format(tier=get_tier_by_id(tier))
+        branch_default = branch_default.format(tier=tier_id)
     if prerelease_channel and "{tier}" in prerelease_channel:
-        kwargs.update(prerelease_channel=prerelease_channel.format(tier=get_tier_by_id(tier)))
+        kwargs.update(prerelease_channel=prerelease_channel.format(tier=tier_id))
     if tier in (SW_UPDATE_TIER_DEV, SW_UPDATE_TIER_ALPHA):
         # adds pip upgrade flag in the develop tier so it will do a upgrade even without a version bump
         kwargs.update(pip_upgrade_flag=True)
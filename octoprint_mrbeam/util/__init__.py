@@ -1,7 +1,8 @@
 from collections import Iterable, Mapping
 from copy import copy, deepcopy
+from distutils.version import LooseVersion
 from functools import wraps
-from itertools import chain, repeat, cycle
+from itertools import repeat, cycle
 import json
 import logging
 import numpy as np
@@ -16,17 +17,21 @@ if sys.version_info >= (3,):
 else:
     _basestring = basestring
 
+# parsed LooseVersion objects by version string, filled lazily by parse_version()
+_parsed_versions = {}
+
 
 def dict_merge(d1, d2, leaf_operation=None):  # (d1: dict, d2: dict):
     """Recursive dictionnary update.
     Can associate an operation for superposing leaves."""
     if isinstance(d1, dict) and isinstance(d2, dict):
         out = copy(d1)
-        for k in set(chain(d1.keys(), d2.keys())):
-            if k in d2.keys() and k in d1.keys():
-                out[k] = dict_merge(d1[k], d2[k], leaf_operation)
-            elif k in d2.keys():
-                out[k] = d2[k]
+        # keys only present in d1 are already in out
+        for k, v in d2.items():
+            if k in d1:
+                out[k] = dict_merge(d1[k], v, leaf_operation)
+            else:
+                out[k] = v
         return out
     elif leaf_operation is not None:
         ret = leaf_operation(d1, d2)
@@ -155,3 +160,17 @@ def makedirs(path, parent=False, exist_ok=True, *a, **kw):
                 pass
             else:
                 raise
+
+
+def parse_version(version):
+    """
+    Returns the LooseVersion of the given version string.
+    Parsed versions are remembered, so every version string is only parsed once.
+    :param version: version string
+    :return: LooseVersion
+    """
+    parsed = _parsed_versions.get(version, None)
+    if parsed is None:
+        parsed = LooseVersion(version)
+        _parsed_versions[version] = parsed
+    return parsed
@@ -43,23 +43,23 @@ def exec_cmd_output(cmd, log=True, shell=False, loglvl=DEBUG):
     if log:
         _logger.log(loglvl, "cmd='%s'", cmd)
     try:
-        output = subprocess.check_output(cmd, shell=shell, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as e:
-        code = e.returncode
-
-        if not log:
-            cmd = cmd[:50] + "..." if len(cmd) > 30 else cmd
-            if e.output is not None:
-                output = e.output[:30] + "..." if len(e.output) > 30 else e.output
-        else:
-            output = e.output
-        _logger.log(
-            loglvl,
-            "Failed to execute command '%s', return code: %s, output: '%s'",
-            cmd,
-            e.returncode,
-            output,
+        p = subprocess.Popen(
+            cmd, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
         )
+        output, _ = p.communicate()
+        code = p.returncode
+        if code != 0:
+            if not log:
+                cmd = cmd[:50] + "..." if len(cmd) > 30 else cmd
+                if output is not None:
+                    output = output[:30] + "..." if len(output) > 30 else output
+            _logger.log(
+                loglvl,
+                "Failed to execute command '%s', return code: %s, output: '%s'",
+                cmd,
+                code,
+                output,
+            )
 
     except Exception as e:
         code = 99
@@ -54,6 +54,7 @@ class DeviceInfo(object):
             self._read_file() if not use_dummy_values else self._get_dummy_values()
         )
         self._model = None
+        self._beamos_version = None
 
     def get(self, key, default=None):
         return self._device_data.get(key, default)
@@ -93,12 +94,19 @@ class DeviceInfo(object):
         Expect the beamos date to be formatted as TIER-YYYY-MM-DD
 
         returns the tier of the beamos and the date of the image creation
+        The value is solely read from device_info file (/etc/mrbeam)
+        and it's cached once parsed.
 
         the name of the method was kept for backward compatibility
 
         Returns:
             tier of beamos, beamos date
         """
+        if self._beamos_version is None:
+            self._beamos_version = self._parse_beamos_version()
+        return self._beamos_version
+
+    def _parse_beamos_version(self):
         from octoprint_mrbeam.software_update_information import BEAMOS_LEGACY_DATE
 
         beamos_date = self._device_data.get(self.KEY_OCTOPI, None)
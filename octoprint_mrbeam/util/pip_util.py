@@ -1,3 +1,5 @@
+import threading
+
 from octoprint_mrbeam.mrb_logger import mrb_logger
 from cmd_exec import exec_cmd_output
 
@@ -7,22 +9,63 @@ DISABLE_PY_WARNING = "--no-python-version-warning"
 # Dictionary of package versions available at different locations
 # {
 # /home/pi/oprint/bin/pip : {
-#   "OctoPrint    x.x.x",
+#   "OctoPrint": "x.x.x",
 #   ...
 #   },
 # /usr/share/iobeam/venv/bin/pip : {
-#   "iobeam y.y.y",
+#   "iobeam": "y.y.y",
 #   ...
 #   }
 # }
 _pip_package_version_lists = {}
 
 
+def clear_pip_version_cache():
+    """
+    Forget the remembered package lists, the next lookup runs `pip list` again.
+    """
+    _pip_package_version_lists.clear()
+
+
 def get_version_of_pip_module(pip_name, pip_command=None, disable_pip_ver_check=True):
     _logger = mrb_logger(__name__ + ".get_version_of_pip_module")
-    global _pip_package_version_lists
-    version = None
-    returncode = -1
+    venv_packages = _get_pip_package_list(pip_command, disable_pip_ver_check)
+    if venv_packages is None:
+        return None
+    # Look up the package in the list available in our venv
+    version = venv_packages.get(pip_name, None)
+    _logger.debug("%s==%s", pip_name, version)
+    return version
+
+
+def prefetch_pip_package_lists(pip_commands, disable_pip_ver_check=True):
+    """
+    Runs the `pip list` discovery of all given pip commands in parallel,
+    following calls of get_version_of_pip_module() are then served from the cache.
+    :param pip_commands: iterable of pip commands, duplicates and already cached ones are skipped
+    """
+    missing = set(
+        pip_command
+        for pip_command in pip_commands
+        if _normalize_pip_command(pip_command, disable_pip_ver_check)
+        not in _pip_package_version_lists
+    )
+    if len(missing) <= 1:
+        # no need for a thread, the single discovery happens on the first lookup
+        return
+    threads = []
+    for pip_command in missing:
+        t = threading.Thread(
+            target=_get_pip_package_list, args=(pip_command, disable_pip_ver_check)
+        )
+        t.daemon = True
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+
+def _normalize_pip_command(pip_command=None, disable_pip_ver_check=True):
     if pip_command is None:
         pip_command = "pip"
     elif isinstance(pip_command, list):
@@ -34,6 +77,14 @@ def get_version_of_pip_module(pip_name, pip_command=None, disable_pip_ver_check=
     ]:  # DISABLE_PY_WARNING]:
         if disable_pip_ver_check and not disabled in pip_command:
             pip_command += " " + disabled
+    return pip_command
+
+
+def _get_pip_package_list(pip_command=None, disable_pip_ver_check=True):
+    _logger = mrb_logger(__name__ + "._get_pip_package_list")
+    global _pip_package_version_lists
+    returncode = -1
+    pip_command = _normalize_pip_command(pip_command, disable_pip_ver_check)
     venv_packages = _pip_package_version_lists.get(pip_command, None)
 
     if venv_packages is None:
@@ -42,7 +93,11 @@ def get_version_of_pip_module(pip_name, pip_command=None, disable_pip_ver_check=
         _logger.debug("refreshing list of installed packages (%s list)", pip_command)
         output, returncode = exec_cmd_output(command, shell=True, log=False)
         if returncode == 0:
-            venv_packages = output.splitlines()
+            venv_packages = dict()
+            for line in output.splitlines():
+                token = line.split()
+                if len(token) >= 2:
+                    venv_packages.setdefault(token[0], token[1])
             _pip_package_version_lists[pip_command] = venv_packages
         elif returncode == 127:
             _logger.error(
@@ -50,15 +105,6 @@ def get_version_of_pip_module(pip_name, pip_command=None, disable_pip_ver_check=
                 pip_command,
                 returncode,
             )
-            return None
         else:
             _logger.warning("`%s list` returned code %s", pip_command, returncode)
-            return None
-    # Go through the package list available in our venv
-    for line in venv_packages:
-        token = line.split()
-        if len(token) >= 2 and token[0] == pip_name:
-            version = token[1]
-            break
-    _logger.debug("%s==%s", pip_name, version)
-    return version
+    return venv_packages
@@ -0,0 +1,25 @@
+from octoprint_mrbeam.migration import (
+    MigrationBaseClass,
+    list_of_migrations,
+    load_migration,
+)
+from octoprint_mrbeam.migration.Mig001 import Mig001NetconnectdDisableLogDebugLevel
+import unittest
+
+
+class TestMigrationList(unittest.TestCase):
+    """
+    Testclass for the list of migrations
+    """
+
+    def test_load_migration(self):
+        self.assertIs(
+            load_migration(
+                "octoprint_mrbeam.migration.Mig001:Mig001NetconnectdDisableLogDebugLevel"
+            ),
+            Mig001NetconnectdDisableLogDebugLevel,
+        )
+
+    def test_all_migrations_loadable(self):
+        for entry in list_of_migrations:
+            self.assertTrue(issubclass(load_migration(entry), MigrationBaseClass))